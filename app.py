@@ -1,13 +1,27 @@
-import streamlit as st
 import os
+
+# Parallel chunked downloads via hf_transfer; must be set before huggingface_hub is imported
+os.environ.setdefault("HF_HUB_ENABLE_HF_TRANSFER", "1")
+
+import streamlit as st
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_community.vectorstores import Chroma
-from langchain.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
-from huggingface_hub import hf_hub_download, snapshot_download
+# LangChain, chromadb, huggingface_hub and the like are imported inside the functions
+# that use them so the page renders before they load; rag_embeddings is stdlib-only
+from rag_embeddings import (
+    COLLECTION_NAME,
+    DEFAULT_EMBEDDING_DIMENSIONS,
+    DEFAULT_EMBEDDING_MODEL,
+    build_embedding_model,
+    effective_dimensions,
+    faq_key,
+)
 
 # Load environment variables
 load_dotenv()
@@ -15,6 +29,37 @@ load_dotenv()
 # Configuration - UPDATE THIS WITH YOUR HUGGING FACE DATASET ID
 HF_DATASET_ID = st.secrets.get("huggingface", {}).get("HF_DATASET_ID", "YOUR_USERNAME/covid19-cord19-vectorstore")
 
+# Incomplete vectorstore downloads live here until they finish
+VECTORSTORE_STAGING_DIR = "chroma_cord19.partial"
+
+# Embedding model used to build the vectorstore. Set to a sentence-transformers model
+# (e.g. "sentence-transformers/all-MiniLM-L6-v2") to embed queries locally; the
+# vectorstore must have been indexed with the same model (see ingest.py).
+EMBEDDING_MODEL = st.secrets.get("embeddings", {}).get("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL)
+# Output size for OpenAI text-embedding-3 models; must match the vectorstore
+EMBEDDING_DIMENSIONS = int(st.secrets.get("embeddings", {}).get("EMBEDDING_DIMENSIONS", DEFAULT_EMBEDDING_DIMENSIONS))
+
+# Optional Redis semantic cache for answers to near-duplicate questions (disabled when REDIS_URL is unset)
+REDIS_URL = st.secrets.get("redis", {}).get("REDIS_URL") or os.getenv("REDIS_URL")
+SEMANTIC_CACHE_DISTANCE_THRESHOLD = 0.05
+SEMANTIC_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# Maximum characters of each retrieved document passed to the LLM
+MAX_CONTEXT_CHARS_PER_DOC = 800
+
+# Questions whose best match scores below this are answered without the LLM. The default
+# assumes a cosine-space index (as built by ingest.py), where it means cosine similarity
+# above 0.3. On a LangChain-default L2 index the score is 1 - squared_l2/sqrt(2), so 0.3
+# already requires cosine above ~0.5; use ~0.0 there for the same cutoff.
+MIN_RELEVANCE_SCORE = float(st.secrets.get("embeddings", {}).get("MIN_RELEVANCE_SCORE", 0.3))
+NO_CONTEXT_ANSWER = "I don't have relevant research in this corpus to answer that question."
+
+# Precomputed neighbors for common questions, generated by precompute_faq.py
+PRECOMPUTED_NN_PATH = "precomputed_nn.json"
+
+# In-process cache of answers to exact repeat questions
+ANSWER_CACHE_SIZE = 256
+
 # Page configuration
 st.set_page_config(
     page_title="COVID-19 Research RAG Chatbot",
@@ -24,7 +69,7 @@ st.set_page_config(
 )
 
 # Custom CSS for better styling
-st.markdown("""
+CUSTOM_CSS = """
 <style>
 .main-header {
     font-size: 2.5rem;
@@ -32,22 +77,6 @@ st.markdown("""
     text-align: center;
     margin-bottom: 2rem;
 }
-.chat-message {
-    padding: 1rem;
-    border-radius: 10px;
-    margin-bottom: 1rem;
-    color: #000000 !important;
-}
-.user-message {
-    background-color: #e1f5fe;
-    border-left: 4px solid #1f77b4;
-    color: #000000 !important;
-}
-.bot-message {
-    background-color: #f3e5f5;
-    border-left: 4px solid #9c27b0;
-    color: #000000 !important;
-}
 .source-box {
     background-color: #f5f5f5;
     padding: 0.5rem;
@@ -56,10 +85,6 @@ st.markdown("""
     font-size: 0.9rem;
     color: #333333 !important;
 }
-/* Force dark text for chat content only */
-.chat-message .stMarkdown, .chat-message .stMarkdown p, .chat-message .stMarkdown div {
-    color: #000000 !important;
-}
 /* Ensure chat input text is visible */
 .stChatInput input {
     color: #000000 !important;
@@ -68,22 +93,174 @@ st.markdown("""
 .intro-text {
     color: #ffffff !important;
 }
-/* Target the description paragraph specifically */
-.main .block-container .stMarkdown p {
+/* Target the description paragraph specifically, leaving chat messages themed */
+.main .block-container .stMarkdown .intro-text p {
     color: #ffffff !important;
 }
 </style>
-""", unsafe_allow_html=True)
+"""
 
-def download_vectorstore_from_hf():
-    """Download vectorstore from Hugging Face if it doesn't exist locally"""
+# Inject on every run: Streamlit removes elements a rerun does not emit again
+st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+
+class AnswerCache:
+    """Thread-safe LRU cache mapping a question hash to its (answer, sources)"""
+
+    def __init__(self, maxsize=ANSWER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(question):
+        return hashlib.sha256(question.encode()).hexdigest()
+
+    def get(self, question):
+        key = self.key(question)
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, question, answer, sources):
+        key = self.key(question)
+        with self._lock:
+            self._entries[key] = (answer, sources)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+@st.cache_resource
+def get_answer_cache():
+    """Answer cache shared by all sessions"""
+    return AnswerCache()
+
+class SemanticAnswerCache:
+    """Redis cache mapping questions to (answer, sources), matched by embedding similarity"""
+
+    def __init__(self, embedding_model):
+        from langchain_redis import RedisSemanticCache
+        
+        # Partition by embedding model and dimension so vectors are never compared across models
+        dimensions = effective_dimensions(EMBEDDING_MODEL, EMBEDDING_DIMENSIONS)
+        self.partition = re.sub(r"\W+", "_", f"cord19_{EMBEDDING_MODEL}_{dimensions}")
+        self._cache = RedisSemanticCache(
+            embeddings=embedding_model,
+            redis_url=REDIS_URL,
+            distance_threshold=SEMANTIC_CACHE_DISTANCE_THRESHOLD,
+            ttl=SEMANTIC_CACHE_TTL_SECONDS,
+            name=self.partition,
+            prefix=self.partition
+        )
+
+    def get(self, question):
+        # The cache is best-effort: a Redis outage must not stop questions being answered
+        try:
+            hit = self._cache.lookup(question, self.partition)
+            if not hit:
+                return None
+            entry = json.loads(hit[0].text)
+            return entry["answer"], entry["sources"]
+        except Exception:
+            return None
+
+    def put(self, question, answer, sources):
+        from langchain_core.outputs import Generation
+        
+        entry = json.dumps({"answer": answer, "sources": sources})
+        try:
+            self._cache.update(question, self.partition, [Generation(text=entry)])
+        except Exception:
+            pass
+
+@st.cache_resource
+def get_embedding_model():
+    """Embedding model shared by retrieval and the semantic cache"""
+    return build_embedding_model(EMBEDDING_MODEL, EMBEDDING_DIMENSIONS)
+
+@st.cache_resource
+def get_semantic_cache():
+    """Semantic answer cache shared by all sessions"""
+    # Errors propagate: st.cache_resource doesn't cache exceptions, so a transient
+    # Redis failure is retried on the next run instead of disabling the cache for good
+    return SemanticAnswerCache(get_embedding_model())
+
+def semantic_cache_if_available():
+    """The semantic answer cache, or None when Redis is not configured or not reachable"""
+    if not REDIS_URL:
+        return None
+    try:
+        return get_semantic_cache()
+    except Exception as e:
+        st.warning(f"⚠️ Semantic cache unavailable: {str(e)}")
+        return None
+
+def load_precomputed_neighbors():
+    """Load the FAQ question-hash -> document ids map, if it has been generated"""
+    path = Path(PRECOMPUTED_NN_PATH)
+    if not path.exists():
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+def render_sources(sources):
+    """Display pre-formatted source preview HTML in an expander"""
+    if not sources:
+        return
+    with st.expander("📄 View Sources"):
+        for i, source in enumerate(sources, 1):
+            st.markdown(f"**Source {i}:**")
+            st.markdown(source, unsafe_allow_html=True)
+
+def vectorstore_available():
+    """Check whether a local vectorstore with content exists"""
     vectorstore_path = Path("chroma_cord19")
+    return vectorstore_path.exists() and any(vectorstore_path.iterdir())
+
+def fetch_vectorstore():
+    """Download the vectorstore files from Hugging Face, moving them into chroma_cord19/ once complete"""
+    from huggingface_hub import snapshot_download
     
-    if vectorstore_path.exists() and len(list(vectorstore_path.glob("**/*"))) > 0:
-        st.info("ℹ️ Using existing local vectorstore")
-        return True
+    # Download into a staging directory so an interrupted download never looks like a
+    # usable vectorstore; the next attempt resumes from the files already there
+    staging_path = Path(VECTORSTORE_STAGING_DIR)
+    snapshot_download(
+        repo_id=HF_DATASET_ID,
+        repo_type="dataset",
+        local_dir=staging_path,
+        # vectorstore/ is the layout older uploads used; never fetch a stale copy of it
+        ignore_patterns=["README.md", ".gitattributes", "vectorstore/*"],
+        max_workers=8
+    )
     
-    if HF_DATASET_ID == "YOUR_USERNAME/covid19-cord19-vectorstore":
+    vectorstore_path = Path("chroma_cord19")
+    if vectorstore_path.exists():
+        vectorstore_path.rmdir()  # Only ever empty here, or there'd be nothing to download
+    staging_path.rename(vectorstore_path)
+
+@st.cache_resource(show_spinner=False)
+def start_vectorstore_download():
+    """Start the vectorstore download in a background thread, once per process.
+    
+    Returns a Future for the download, or None if no download is needed or possible.
+    """
+    if vectorstore_available() or HF_DATASET_ID == "YOUR_USERNAME/covid19-cord19-vectorstore":
+        return None
+    executor = ThreadPoolExecutor(max_workers=1)
+    download = executor.submit(fetch_vectorstore)
+    executor.shutdown(wait=False)
+    return download
+
+def download_vectorstore_from_hf():
+    """Wait for the vectorstore download from Hugging Face if it doesn't exist locally"""
+    download = start_vectorstore_download()
+    
+    if download is None:
+        if vectorstore_available():
+            st.info("ℹ️ Using existing local vectorstore")
+            return True
+        
         st.error("❌ Please update HF_DATASET_ID in app.py with your actual Hugging Face dataset ID")
         st.info("💡 Run upload_to_hf.py first to upload your vectorstore, then update the HF_DATASET_ID variable")
         return False
@@ -98,24 +275,8 @@ def download_vectorstore_from_hf():
         status_text.text("Downloading vectorstore files...")
         progress_bar.progress(25)
         
-        # Download the entire vectorstore folder from HF
-        snapshot_download(
-            repo_id=HF_DATASET_ID,
-            repo_type="dataset",
-            local_dir=".",
-            allow_patterns="vectorstore/*"
-        )
-        
-        progress_bar.progress(75)
-        status_text.text("Organizing files...")
-        
-        # Move files from vectorstore/ to chroma_cord19/
-        downloaded_path = Path("vectorstore")
-        if downloaded_path.exists():
-            if vectorstore_path.exists():
-                import shutil
-                shutil.rmtree(vectorstore_path)
-            downloaded_path.rename(vectorstore_path)
+        # Wait for the background download to finish
+        download.result()
         
         progress_bar.progress(100)
         status_text.text("✅ Vectorstore downloaded successfully!")
@@ -129,6 +290,8 @@ def download_vectorstore_from_hf():
         return True
         
     except Exception as e:
+        # Forget the failed download so the next attempt starts a fresh one
+        start_vectorstore_download.clear()
         st.error(f"❌ Error downloading vectorstore: {str(e)}")
         st.info("💡 Please check your HF_DATASET_ID and ensure the dataset exists and is public")
         return False
@@ -136,25 +299,60 @@ def download_vectorstore_from_hf():
 @st.cache_resource
 def initialize_rag_chain():
     """Initialize the RAG chain with cached vectorstore"""
+    import chromadb
+    from chromadb.config import Settings
+    from langchain_openai import ChatOpenAI
+    from langchain_community.vectorstores import Chroma
+    from langchain.prompts import ChatPromptTemplate
+    from langchain_core.documents import Document
+    
     try:
         # Download vectorstore if needed
         if not download_vectorstore_from_hf():
-            return None, None
+            return None
         
-        # Initialize embeddings
-        embedding_model = OpenAIEmbeddings()
+        # Initialize embeddings (cached on disk so repeated queries skip the model)
+        embedding_model = get_embedding_model()
         
-        # Load existing vectorstore
+        # Load existing vectorstore through an explicit persistent client (telemetry off)
+        # instead of letting LangChain build one from persist_directory
+        client = chromadb.PersistentClient(
+            path="chroma_cord19",
+            settings=Settings(anonymized_telemetry=False)
+        )
         vectorstore = Chroma(
-            persist_directory="chroma_cord19",
+            client=client,
+            collection_name=COLLECTION_NAME,
             embedding_function=embedding_model
         )
         
-        # Create retriever
-        retriever = vectorstore.as_retriever(search_kwargs={"k": 5})
+        precomputed_nn = load_precomputed_neighbors()
+        
+        def retrieve(question):
+            """Fetch precomputed documents for FAQ questions, else search the vectorstore.
+            
+            Returns no documents when nothing in the corpus is relevant enough.
+            """
+            # Short questions rarely need 5 documents; fewer keeps the prompt small
+            k = 3 if len(question.split()) < 8 else 5
+            
+            doc_ids = precomputed_nn.get(faq_key(question), [])[:k]
+            if doc_ids:
+                result = vectorstore.get(ids=doc_ids)
+                docs_by_id = {
+                    doc_id: Document(page_content=text, metadata=metadata or {})
+                    for doc_id, text, metadata in zip(result["ids"], result["documents"], result["metadatas"])
+                }
+                docs = [docs_by_id[doc_id] for doc_id in doc_ids if doc_id in docs_by_id]
+                if docs:
+                    return docs
+            docs_and_scores = vectorstore.similarity_search_with_relevance_scores(question, k=k)
+            if not docs_and_scores or max(score for _, score in docs_and_scores) < MIN_RELEVANCE_SCORE:
+                return []
+            return [doc for doc, _ in docs_and_scores]
         
         # Initialize LLM
-        llm = ChatOpenAI(model_name="gpt-3.5-turbo", temperature=0)
+        llm = ChatOpenAI(model_name="gpt-3.5-turbo", temperature=0, streaming=True)
         
         # Create prompt template
         template = """You are a helpful assistant with access to COVID-19 medical research.
@@ -167,23 +365,37 @@ Answer: Please provide a comprehensive answer based on the research context. If
 
         prompt = ChatPromptTemplate.from_template(template)
         
-        # Helper function to format documents
+        # Helper function to format documents, labelled to match the displayed sources
         def format_docs(docs):
-            return "\n\n".join([doc.page_content for doc in docs])
+            return "\n\n".join(
+                f"[Source {i}] {doc.page_content[:MAX_CONTEXT_CHARS_PER_DOC]}"
+                for i, doc in enumerate(docs, 1)
+            )
         
-        # Create RAG chain
-        rag_chain = (
-            {"context": retriever | format_docs, "question": RunnablePassthrough()}
-            | prompt
-            | llm
-            | StrOutputParser()
-        )
+        # Call the LLM directly rather than through a runnable pipeline. This stays a
+        # synchronous ChatOpenAI stream: Streamlit's script thread consumes it token by
+        # token, so an async client would have no other work to overlap with
+        def stream_answer(messages):
+            for chunk in llm.stream(messages):
+                yield chunk.content
         
-        return rag_chain, retriever
+        def answer_with_sources(question):
+            """Retrieve documents once and return a token stream for the answer plus the sources"""
+            docs = retrieve(question)
+            if not docs:
+                # Question is outside the corpus: answer without calling the LLM
+                return iter([NO_CONTEXT_ANSWER]), docs
+            messages = prompt.format_messages(context=format_docs(docs), question=question)
+            return stream_answer(messages), docs
+        
+        return answer_with_sources
     
     except Exception as e:
         st.error(f"Error initializing RAG chain: {str(e)}")
-        return None, None
+        return None
+
+# Start fetching the vectorstore while the UI renders
+start_vectorstore_download()
 
 def main():
     st.markdown('<h1 class="main-header">🧬 COVID-19 Research RAG Chatbot</h1>', unsafe_allow_html=True)
@@ -200,7 +412,6 @@ def main():
         st.session_state.messages = []
     if "rag_chain" not in st.session_state:
         st.session_state.rag_chain = None
-        st.session_state.retriever = None
     
     # Sidebar
     with st.sidebar:
@@ -236,9 +447,11 @@ def main():
         """)
         
         # Show vectorstore status
-        vectorstore_path = Path("chroma_cord19")
-        if vectorstore_path.exists():
+        download = start_vectorstore_download()
+        if vectorstore_available():
             st.success("✅ Vectorstore loaded")
+        elif download is not None and not download.done():
+            st.warning("⏳ Downloading vectorstore from Hugging Face...")
         else:
             st.warning("⏳ Vectorstore will be downloaded on first use")
         
@@ -249,26 +462,22 @@ def main():
     # Initialize RAG chain
     if st.session_state.rag_chain is None:
         with st.spinner("🔄 Loading vectorstore and initializing RAG chain..."):
-            rag_chain, retriever = initialize_rag_chain()
+            rag_chain = initialize_rag_chain()
             if rag_chain:
                 st.session_state.rag_chain = rag_chain
-                st.session_state.retriever = retriever
                 st.success("✅ RAG chain initialized successfully!")
             else:
+                # Don't keep the failed result cached, so the next run tries again
+                initialize_rag_chain.clear()
                 st.error("❌ Failed to initialize RAG chain. Please check your configuration.")
                 return
     
     # Display chat messages
     for message in st.session_state.messages:
-        if message["role"] == "user":
-            st.markdown(f'<div class="chat-message user-message"><strong>You:</strong> {message["content"]}</div>', unsafe_allow_html=True)
-        else:
-            st.markdown(f'<div class="chat-message bot-message"><strong>Assistant:</strong> {message["content"]}</div>', unsafe_allow_html=True)
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
             if "sources" in message:
-                with st.expander("📄 View Sources"):
-                    for i, source in enumerate(message["sources"], 1):
-                        st.markdown(f"**Source {i}:**")
-                        st.markdown(f'<div class="source-box">{source}</div>', unsafe_allow_html=True)
+                render_sources(message["sources"])
     
     # Chat input
     if prompt := st.chat_input("Ask a question about COVID-19 research..."):
@@ -276,43 +485,62 @@ def main():
         st.session_state.messages.append({"role": "user", "content": prompt})
         
         # Display user message
-        st.markdown(f'<div class="chat-message user-message"><strong>You:</strong> {prompt}</div>', unsafe_allow_html=True)
+        with st.chat_message("user"):
+            st.markdown(prompt)
         
         # Generate response
-        with st.spinner("🤔 Thinking..."):
-            try:
-                # Get response from RAG chain
-                response = st.session_state.rag_chain.invoke(prompt)
+        try:
+            answer_cache = get_answer_cache()
+            semantic_cache = semantic_cache_if_available()
+            cached = answer_cache.get(prompt)
+            if cached is None and semantic_cache is not None:
+                cached = semantic_cache.get(prompt)
+            if cached:
+                # Repeat or near-duplicate question: skip retrieval and the LLM entirely
+                response, sources = cached
+                with st.chat_message("assistant"):
+                    st.markdown(response)
+                    render_sources(sources)
+            else:
+                # Retrieve source documents before streaming so sources are ready
+                with st.spinner("🤔 Thinking..."):
+                    answer_stream, source_docs = st.session_state.rag_chain(prompt)
                 
-                # Get source documents for transparency
-                source_docs = st.session_state.retriever.get_relevant_documents(prompt)
+                # Format source documents once; history re-renders the stored HTML as-is
                 sources = []
                 for doc in source_docs:
-                    title = doc.metadata.get("title", "Unknown Title")
-                    publish_time = doc.metadata.get("publish_time", "Unknown Date")
-                    content_preview = doc.page_content[:200] + "..." if len(doc.page_content) > 200 else doc.page_content
-                    sources.append(f"**{title}** ({publish_time})\n{content_preview}")
-                
-                # Add assistant response to chat history
-                st.session_state.messages.append({
-                    "role": "assistant", 
-                    "content": response,
-                    "sources": sources
-                })
-                
-                # Display assistant response
-                st.markdown(f'<div class="chat-message bot-message"><strong>Assistant:</strong> {response}</div>', unsafe_allow_html=True)
+                    metadata = doc.metadata
+                    title = metadata.get("title", "Unknown Title")
+                    publish_time = metadata.get("publish_time", "Unknown Date")
+                    content = doc.page_content
+                    content_preview = content[:200] + "..." if len(content) > 200 else content
+                    sources.append(f'<div class="source-box">**{title}** ({publish_time})\n{content_preview}</div>')
                 
-                # Display sources
-                with st.expander("📄 View Sources"):
-                    for i, source in enumerate(sources, 1):
-                        st.markdown(f"**Source {i}:**")
-                        st.markdown(f'<div class="source-box">{source}</div>', unsafe_allow_html=True)
+                with st.chat_message("assistant"):
+                    # Stream assistant response as tokens arrive
+                    response = st.write_stream(answer_stream)
+                    
+                    # Display sources
+                    render_sources(sources)
                 
-            except Exception as e:
-                error_message = f"Sorry, I encountered an error: {str(e)}"
-                st.session_state.messages.append({"role": "assistant", "content": error_message})
-                st.markdown(f'<div class="chat-message bot-message"><strong>Assistant:</strong> {error_message}</div>', unsafe_allow_html=True)
+                # Don't let an empty or misconfigured store pin the canned reply in the caches
+                if response != NO_CONTEXT_ANSWER:
+                    answer_cache.put(prompt, response, sources)
+                    if semantic_cache is not None:
+                        semantic_cache.put(prompt, response, sources)
+            
+            # Add assistant response to chat history
+            st.session_state.messages.append({
+                "role": "assistant", 
+                "content": response,
+                "sources": sources
+            })
+            
+        except Exception as e:
+            error_message = f"Sorry, I encountered an error: {str(e)}"
+            st.session_state.messages.append({"role": "assistant", "content": error_message})
+            with st.chat_message("assistant"):
+                st.markdown(error_message)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
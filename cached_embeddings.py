@@ -0,0 +1,45 @@
+"""
+On-disk cache for embedding vectors. Kept apart from rag_embeddings.py because
+subclassing langchain_core's Embeddings pulls in most of the LangChain import
+cost; rag_embeddings.build_embedding_model() imports this only when called.
+"""
+
+import hashlib
+
+from langchain_core.embeddings import Embeddings
+
+# On-disk cache for query embeddings, shared across sessions and restarts
+EMBEDDING_CACHE_DIR = "emb_cache"
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that memoizes vectors on disk, keyed by a SHA-256 of the text"""
+
+    def __init__(self, embeddings, namespace, cache_dir=EMBEDDING_CACHE_DIR):
+        import diskcache
+
+        self.embeddings = embeddings
+        self.namespace = namespace
+        self.cache = diskcache.Cache(cache_dir)
+
+    def _key(self, text):
+        # Include the model name so switching models never returns stale vectors
+        return hashlib.sha256(f"{self.namespace}\0{text}".encode()).hexdigest()
+
+    def embed_query(self, text):
+        key = self._key(text)
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache[key] = vector
+        return vector
+
+    def embed_documents(self, texts):
+        keys = [self._key(text) for text in texts]
+        vectors = [self.cache.get(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            new_vectors = self.embeddings.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, new_vectors):
+                self.cache[keys[i]] = vector
+                vectors[i] = vector
+        return vectors
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Script to (re)build the Chroma vectorstore from pre-chunked CORD-19 papers.
+Chunks are embedded in large batches with several requests in flight, then
+written straight to the chromadb collection that app.py reads.
+
+Input is a JSONL file with one chunk per line:
+{"id": "...", "text": "...", "metadata": {"title": "...", "publish_time": "..."}}
+"""
+
+import argparse
+import asyncio
+import json
+from pathlib import Path
+
+import chromadb
+from chromadb.config import Settings
+from dotenv import load_dotenv
+
+from rag_embeddings import COLLECTION_NAME, DEFAULT_EMBEDDING_DIMENSIONS, DEFAULT_EMBEDDING_MODEL, build_embedding_model
+
+BATCH_SIZE = 512
+MAX_CONCURRENT_BATCHES = 8  # Keep within your OpenAI requests-per-minute limit
+
+# Use cosine distance instead of Chroma's default (squared) L2. For normalized
+# embeddings the ranking is the same; what changes is the scale of the app's
+# relevance scores, which MIN_RELEVANCE_SCORE in app.py is compared against.
+HNSW_METADATA = {"hnsw:space": "cosine"}
+
+def read_chunks(path):
+    """Read chunks from a JSONL file, assigning ids to chunks without one"""
+    chunks = []
+    with open(path, "r") as f:
+        for line_number, line in enumerate(f):
+            if not line.strip():
+                continue
+            chunk = json.loads(line)
+            chunk.setdefault("id", f"chunk-{line_number}")
+            # Chroma only accepts scalar metadata values (str, int, float, bool)
+            metadata = chunk.get("metadata") or {}
+            chunk["metadata"] = {k: v for k, v in metadata.items() if isinstance(v, (str, int, float, bool))}
+            chunks.append(chunk)
+    return chunks
+
+async def embed_batches(embeddings, batches):
+    """Embed several batches concurrently, one API request per batch"""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_BATCHES)
+
+    async def embed(batch):
+        async with semaphore:
+            return await embeddings.aembed_documents([chunk["text"] for chunk in batch])
+
+    return await asyncio.gather(*(embed(batch) for batch in batches))
+
+async def store_batches(embeddings, collection, batches, total_chunks):
+    """Embed and store batches, a window at a time to bound memory use"""
+    for start in range(0, len(batches), MAX_CONCURRENT_BATCHES):
+        window = batches[start:start + MAX_CONCURRENT_BATCHES]
+        vectors = await embed_batches(embeddings, window)
+
+        for batch, batch_vectors in zip(window, vectors):
+            collection.upsert(
+                ids=[chunk["id"] for chunk in batch],
+                embeddings=batch_vectors,
+                documents=[chunk["text"] for chunk in batch],
+                metadatas=[chunk["metadata"] or None for chunk in batch]
+            )
+
+        done = min((start + len(window)) * BATCH_SIZE, total_chunks)
+        print(f"📤 Embedded and stored {done}/{total_chunks} chunks")
+
+def ingest(chunks_path, persist_directory="chroma_cord19",
+           embedding_model=DEFAULT_EMBEDDING_MODEL, embedding_dimensions=DEFAULT_EMBEDDING_DIMENSIONS, reset=False):
+    chunks = read_chunks(chunks_path)
+    print(f"📂 Loaded {len(chunks)} chunks from: {chunks_path}")
+
+    # No on-disk cache here: corpus vectors are stored in Chroma, not looked up again
+    embeddings = build_embedding_model(embedding_model, embedding_dimensions, cache=False)
+    print(f"🧠 Embedding with: {embedding_model}")
+    client = chromadb.PersistentClient(path=persist_directory, settings=Settings(anonymized_telemetry=False))
+    if reset:
+        # A collection keeps its dimension and distance space for life, so a rebuild
+        # with another model (or space) has to start from a fresh one
+        try:
+            client.delete_collection(COLLECTION_NAME)
+            print(f"🗑️  Deleted existing collection: {COLLECTION_NAME}")
+        except Exception:
+            pass  # Nothing to delete yet
+    collection = client.get_or_create_collection(COLLECTION_NAME, metadata=HNSW_METADATA)
+    if collection.count() > 0:
+        print(f"⚠️  Adding to {collection.count()} existing chunks; use --reset to rebuild from scratch")
+
+    batches = [chunks[i:i + BATCH_SIZE] for i in range(0, len(chunks), BATCH_SIZE)]
+
+    # One event loop for the whole run: the async OpenAI client keeps pooled
+    # connections bound to the loop it was first used on
+    asyncio.run(store_batches(embeddings, collection, batches, len(chunks)))
+
+    print(f"🎉 Vectorstore written to: {Path(persist_directory).resolve()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the Chroma vectorstore from chunked papers")
+    parser.add_argument("chunks", help="JSONL file with one chunk per line")
+    parser.add_argument("--persist-directory", default="chroma_cord19", help="Chroma directory to write to")
+    parser.add_argument("--embedding-model", default=DEFAULT_EMBEDDING_MODEL,
+                        help="OpenAI model or sentence-transformers/... model; must match EMBEDDING_MODEL in the app")
+    parser.add_argument("--embedding-dimensions", type=int, default=DEFAULT_EMBEDDING_DIMENSIONS,
+                        help="Output size for OpenAI text-embedding-3 models (0 or other models: native size); must match EMBEDDING_DIMENSIONS in the app")
+    parser.add_argument("--reset", action="store_true",
+                        help="Delete the existing collection first (required when changing embedding model or size)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    print("🧬 CORD-19 Vectorstore Ingestion")
+    print("=" * 40)
+    ingest(args.chunks, args.persist_directory, args.embedding_model, args.embedding_dimensions, args.reset)
@@ -32,9 +32,8 @@ def check_local_setup():
     vectorstore_path = Path("chroma_cord19")
     if vectorstore_path.exists():
         # Check if it has content
-        files = list(vectorstore_path.glob("**/*"))
-        if len(files) > 0:
-            success.append(f"✅ Local vectorstore found with {len(files)} files")
+        if any(vectorstore_path.iterdir()):
+            success.append("✅ Local vectorstore found")
         else:
             success.append("⚠️  Empty vectorstore directory (will download from HF)")
     else:
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Script to precompute vectorstore neighbors for common COVID-19 questions.
+The app serves these questions from precomputed_nn.json without embedding
+the query or searching Chroma. Re-run it whenever the vectorstore changes.
+
+The FAQ list can be edited under [faq] QUERIES in .streamlit/secrets.toml.
+"""
+
+import argparse
+import json
+import tomllib
+from pathlib import Path
+
+import chromadb
+from chromadb.config import Settings
+from dotenv import load_dotenv
+
+from rag_embeddings import (
+    COLLECTION_NAME,
+    DEFAULT_EMBEDDING_DIMENSIONS,
+    DEFAULT_EMBEDDING_MODEL,
+    build_embedding_model,
+    faq_key,
+)
+
+TOP_K = 5
+OUTPUT_PATH = "precomputed_nn.json"
+
+FAQ_QUERIES = [
+    "What are the symptoms of COVID-19?",
+    "What are the neurological effects of COVID-19?",
+    "What treatments have been proven effective in clinical trials?",
+    "Is there a connection between COVID-19 and autoimmune diseases?",
+    "What long-term effects does COVID-19 have on young adults?",
+    "What is long COVID?",
+    "How effective are COVID-19 vaccines?",
+    "What are the side effects of COVID-19 vaccines?",
+    "How does SARS-CoV-2 spread?",
+    "How long is the incubation period of COVID-19?",
+    "Who is at higher risk of severe COVID-19?",
+    "How does COVID-19 affect children?",
+    "What are the cardiovascular effects of COVID-19?",
+    "How does COVID-19 affect mental health?",
+    "Do masks reduce COVID-19 transmission?",
+]
+
+def load_faq_queries():
+    """Use the FAQ list from Streamlit secrets if configured, else the built-in list"""
+    secrets_path = Path(".streamlit/secrets.toml")
+    if secrets_path.exists():
+        with open(secrets_path, "rb") as f:
+            queries = tomllib.load(f).get("faq", {}).get("QUERIES")
+        if queries:
+            return queries
+    return FAQ_QUERIES
+
+def precompute_faq_neighbors(persist_directory="chroma_cord19",
+                             embedding_model=DEFAULT_EMBEDDING_MODEL, embedding_dimensions=DEFAULT_EMBEDDING_DIMENSIONS):
+    queries = load_faq_queries()
+    print(f"❓ Precomputing neighbors for {len(queries)} FAQ queries")
+
+    embeddings = build_embedding_model(embedding_model, embedding_dimensions, cache=False)
+    client = chromadb.PersistentClient(path=persist_directory, settings=Settings(anonymized_telemetry=False))
+    collection = client.get_collection(COLLECTION_NAME)
+
+    query_embeddings = embeddings.embed_documents(queries)
+    results = collection.query(query_embeddings=query_embeddings, n_results=TOP_K, include=[])
+
+    neighbors = {faq_key(query): ids for query, ids in zip(queries, results["ids"])}
+    with open(OUTPUT_PATH, "w") as f:
+        json.dump(neighbors, f, indent=2)
+
+    print(f"🎉 Wrote {len(neighbors)} entries to: {OUTPUT_PATH}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute vectorstore neighbors for FAQ questions")
+    parser.add_argument("--persist-directory", default="chroma_cord19", help="Chroma directory to query")
+    parser.add_argument("--embedding-model", default=DEFAULT_EMBEDDING_MODEL,
+                        help="Model the vectorstore was built with; must match EMBEDDING_MODEL in the app")
+    parser.add_argument("--embedding-dimensions", type=int, default=DEFAULT_EMBEDDING_DIMENSIONS,
+                        help="Output size for OpenAI text-embedding-3 models (0 or other models: native size); must match EMBEDDING_DIMENSIONS in the app")
+    args = parser.parse_args()
+
+    load_dotenv()
+    print("🧬 CORD-19 FAQ Precomputation")
+    print("=" * 40)
+    precompute_faq_neighbors(args.persist_directory, args.embedding_model, args.embedding_dimensions)
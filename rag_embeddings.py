@@ -0,0 +1,51 @@
+"""
+Embedding models and vectorstore conventions shared by app.py and the offline
+scripts (ingest.py, precompute_faq.py), so the vectorstore is always built and
+queried the same way. Only the standard library is imported at module level,
+so app.py can import this on every rerun without loading LangChain.
+"""
+
+import hashlib
+
+# Chroma collection holding the corpus (LangChain's default collection name)
+COLLECTION_NAME = "langchain"
+
+# Defaults must match the model and size the published vectorstore was built with
+DEFAULT_EMBEDDING_MODEL = "text-embedding-3-small"
+DEFAULT_EMBEDDING_DIMENSIONS = 512
+
+def effective_dimensions(model, dimensions):
+    """Output size actually requested from `model`, or None for the model's native size.
+
+    Only OpenAI's text-embedding-3 models accept a `dimensions` parameter
+    (text-embedding-ada-002 rejects it); 0 also means the native size.
+    """
+    if model.startswith("text-embedding-3") and dimensions:
+        return dimensions
+    return None
+
+def build_embedding_model(model=DEFAULT_EMBEDDING_MODEL, dimensions=DEFAULT_EMBEDDING_DIMENSIONS, cache=True):
+    """Create an embedding model by name, optionally wrapped in the on-disk cache.
+
+    "sentence-transformers/..." models run locally (requires sentence-transformers);
+    anything else is an OpenAI model, truncated to `dimensions` where supported.
+    """
+    from cached_embeddings import CachedEmbeddings
+
+    dimensions = effective_dimensions(model, dimensions)
+    if model.startswith("sentence-transformers/"):
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        embeddings = HuggingFaceEmbeddings(
+            model_name=model,
+            encode_kwargs={"normalize_embeddings": True}
+        )
+    else:
+        from langchain_openai import OpenAIEmbeddings
+        embeddings = OpenAIEmbeddings(model=model, dimensions=dimensions)
+    namespace = f"{model}:{dimensions}" if dimensions else model
+
+    return CachedEmbeddings(embeddings, namespace=namespace) if cache else embeddings
+
+def faq_key(question):
+    """Normalize a question (case, whitespace) and hash it for the precomputed FAQ lookup"""
+    return hashlib.sha256(" ".join(question.lower().split()).encode()).hexdigest()
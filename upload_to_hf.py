@@ -40,13 +40,15 @@ def upload_vectorstore_to_hf():
         except Exception as e:
             print(f"⚠️  Repository might already exist: {e}")
         
-        # Upload the entire vectorstore directory
+        # Upload the vectorstore files to the repo root so the app can download
+        # them straight into chroma_cord19/, removing the vectorstore/ tree that
+        # older versions of this script uploaded
         print("📤 Uploading vectorstore files...")
         api.upload_folder(
             folder_path=str(vectorstore_path),
             repo_id=REPO_ID,
             repo_type="dataset",
-            path_in_repo="vectorstore"
+            delete_patterns=["vectorstore/*"]
         )
         
         print(f"🎉 Successfully uploaded vectorstore to: https://huggingface.co/datasets/{REPO_ID}")
@@ -63,9 +65,9 @@ This vectorstore is used by a Streamlit RAG application for COVID-19 research Q&
 
 ## Contents
 
-- `vectorstore/`: Chroma vectorstore files including embeddings and metadata
+- Chroma vectorstore files (at the repo root) including embeddings and metadata
 - Papers: ~2000 recent COVID-19 research papers
-- Embeddings: OpenAI embeddings
+- Embeddings: OpenAI `text-embedding-3-small`, 512 dimensions
 
 ## Citation
 